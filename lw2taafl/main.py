@@ -83,6 +83,266 @@ def writeMoore(filename, states, inputSymbols, transitions, outputs, initialStat
             writer.writerow(row)
 
 
+MEALY_MODULE_TEMPLATE = """SYMBOLS = {symbols!r}
+WIDTH = {width!r}
+DEAD = {dead!r}
+TRANSITIONS = {table}
+OUTPUTS = {outputs!r}
+
+
+def run(iterable):
+    symbols = SYMBOLS
+    transitions = TRANSITIONS
+    outputs = OUTPUTS
+    state = 0
+    trace = []
+    for symbol in iterable:
+        symbolClass = symbols.get(symbol)
+        if symbolClass is None:
+            raise ValueError(f"No transition for symbol: {{symbol}}")
+        index = state * WIDTH + symbolClass
+        state = transitions[index]
+        if state == DEAD:
+            raise ValueError(f"No transition for symbol: {{symbol}}")
+        trace.append(outputs[index])
+    return trace
+"""
+
+MOORE_MODULE_TEMPLATE = """SYMBOLS = {symbols!r}
+WIDTH = {width!r}
+DEAD = {dead!r}
+TRANSITIONS = {table}
+OUTPUTS = {outputs!r}
+
+
+def run(iterable):
+    symbols = SYMBOLS
+    transitions = TRANSITIONS
+    outputs = OUTPUTS
+    state = 0
+    trace = []
+    for symbol in iterable:
+        symbolClass = symbols.get(symbol)
+        if symbolClass is None:
+            raise ValueError(f"No transition for symbol: {{symbol}}")
+        state = transitions[state * WIDTH + symbolClass]
+        if state == DEAD:
+            raise ValueError(f"No transition for symbol: {{symbol}}")
+        trace.append(outputs[state])
+    return trace
+"""
+
+
+def buildTable(states, inputSymbols, transitions, initialState, outputs=None):
+    states = [initialState] + list(filter(lambda x: x != initialState, states))
+    stateIndex = {state: i for i, state in enumerate(states)}
+    symbolClasses, symbolClass = getSymbolClasses(states, inputSymbols, transitions, outputs)
+    dead = len(states)
+
+    table = []
+    for state in states:
+        for symbols in symbolClasses:
+            transition = transitions[state][symbols[0]]
+            table.append(stateIndex[transition] if transition else dead)
+
+    return states, symbolClasses, symbolClass, table
+
+
+def formatTable(table, dead):
+    if dead < 256:
+        return repr(bytes(table))
+    from array import array
+    return f"memoryview({array('I', table).tobytes()!r}).cast('I')"
+
+
+def generateMealy(filename, states, inputSymbols, transitions, outputs, initialState):
+    states, symbolClasses, symbolClass, table = buildTable(states, inputSymbols, transitions, initialState, outputs)
+    tableOutputs = tuple(outputs[state][symbols[0]] for state in states for symbols in symbolClasses)
+    with open(filename, 'w', encoding="utf-8") as f:
+        f.write(MEALY_MODULE_TEMPLATE.format(
+            symbols=symbolClass,
+            width=len(symbolClasses),
+            dead=len(states),
+            table=formatTable(table, len(states)),
+            outputs=tableOutputs,
+        ))
+
+
+def generateMoore(filename, states, inputSymbols, transitions, outputs, initialState):
+    states, symbolClasses, symbolClass, table = buildTable(states, inputSymbols, transitions, initialState)
+    with open(filename, 'w', encoding="utf-8") as f:
+        f.write(MOORE_MODULE_TEMPLATE.format(
+            symbols=symbolClass,
+            width=len(symbolClasses),
+            dead=len(states),
+            table=formatTable(table, len(states)),
+            outputs=tuple(outputs[state] for state in states),
+        ))
+
+
+MIN_SHARD_SIZE = 1 << 16
+
+replayWorker = {}
+
+
+def splitShards(log, size, count):
+    shardSize = max(MIN_SHARD_SIZE, size // count)
+    shards = []
+    start = 0
+    while start < size:
+        end = min(start + shardSize, size)
+        if end < size:
+            newline = log.find(b"\n", end - 1)
+            end = size if newline == -1 else newline + 1
+        shards.append((start, end))
+        start = end
+    return shards
+
+
+def initReplayWorker(logFileName, memoryName, width, dead, symbolClass, outputs, mealy):
+    import mmap
+    from multiprocessing import shared_memory
+
+    memory = shared_memory.SharedMemory(name=memoryName)
+    with open(logFileName, "rb") as logFile:
+        log = mmap.mmap(logFile.fileno(), 0, access=mmap.ACCESS_READ)
+    replayWorker.update(
+        memory=memory,
+        log=log,
+        table=memory.buf.cast("i"),
+        width=width,
+        dead=dead,
+        symbolClass=symbolClass,
+        outputs=outputs,
+        mealy=mealy,
+    )
+
+
+def replayShard(shard):
+    start, end = shard
+    table = replayWorker["table"]
+    width = replayWorker["width"]
+    dead = replayWorker["dead"]
+    symbolClass = replayWorker["symbolClass"]
+    outputs = replayWorker["outputs"]
+    mealy = replayWorker["mealy"]
+
+    logLines = replayWorker["log"][start:end].split(b"\n")
+    if not logLines[-1]:
+        logLines.pop()
+
+    lines = []
+    for logLine in logLines:
+        line = logLine.removesuffix(b"\r").decode("utf-8")
+        state = 0
+        trace = []
+        for symbol in line.split():
+            classId = symbolClass.get(symbol)
+            if state == dead or classId is None:
+                state = dead
+                trace.append("-")
+                continue
+            index = state * width + classId
+            state = table[index]
+            if state == dead:
+                trace.append("-")
+            elif mealy:
+                trace.append(outputs[index])
+            else:
+                trace.append(outputs[state])
+        lines.append(" ".join(trace) + "\n")
+    return "".join(lines)
+
+
+def replay(machineType, machineFileName, logFileName, outputFileName, processes=None):
+    import mmap
+    import multiprocessing
+    import os
+    from array import array
+    from multiprocessing import shared_memory
+
+    mealy = machineType == "mealy"
+    if mealy:
+        states, inputSymbols, transitions, outputs, initialState = readMealy(machineFileName)
+        states, symbolClasses, symbolClass, table = buildTable(states, inputSymbols, transitions, initialState, outputs)
+        tableOutputs = tuple(outputs[state][symbols[0]] for state in states for symbols in symbolClasses)
+    else:
+        states, inputSymbols, transitions, outputs, initialState = readMoore(machineFileName)
+        states, symbolClasses, symbolClass, table = buildTable(states, inputSymbols, transitions, initialState)
+        tableOutputs = tuple(outputs[state] for state in states)
+    processes = processes or os.cpu_count() or 1
+
+    with open(logFileName, "rb") as logFile:
+        size = os.fstat(logFile.fileno()).st_size
+        if size == 0:
+            shards = []
+        else:
+            with mmap.mmap(logFile.fileno(), 0, access=mmap.ACCESS_READ) as log:
+                shards = splitShards(log, size, processes * 4)
+
+    with open(outputFileName, "w", encoding="utf-8") as f:
+        if not shards:
+            return
+
+        tableBytes = array("i", table).tobytes()
+        memory = shared_memory.SharedMemory(create=True, size=max(len(tableBytes), 1))
+        try:
+            memory.buf[:len(tableBytes)] = tableBytes
+            initArgs = (logFileName, memory.name, len(symbolClasses), len(states), symbolClass, tableOutputs, mealy)
+            with multiprocessing.Pool(min(processes, len(shards)), initReplayWorker, initArgs) as pool:
+                for text in pool.imap(replayShard, shards):
+                    f.write(text)
+        finally:
+            memory.close()
+            memory.unlink()
+
+
+def findTraceDifference(first, second, mealy):
+    _, firstSymbols, firstTransitions, firstOutputs, firstInitialState = first
+    _, secondSymbols, secondTransitions, secondOutputs, secondInitialState = second
+    symbols = firstSymbols + [symbol for symbol in secondSymbols if symbol not in firstSymbols]
+
+    def getNext(transitions, state, symbol):
+        return transitions[state].get(symbol, "") if state else ""
+
+    def getOutput(outputs, state, symbol=None):
+        if not state:
+            return ""
+        return outputs[state].get(symbol, "") if mealy else outputs[state]
+
+    start = (firstInitialState, secondInitialState)
+    if not mealy and getOutput(firstOutputs, start[0]) != getOutput(secondOutputs, start[1]):
+        return []
+
+    words = {start: []}
+    queue = [start]
+    for first, second in queue:
+        for symbol in symbols:
+            pair = (getNext(firstTransitions, first, symbol), getNext(secondTransitions, second, symbol))
+            if mealy:
+                outputPair = (getOutput(firstOutputs, first, symbol), getOutput(secondOutputs, second, symbol))
+            else:
+                outputPair = (getOutput(firstOutputs, pair[0]), getOutput(secondOutputs, pair[1]))
+            if outputPair[0] != outputPair[1]:
+                return words[(first, second)] + [symbol]
+            if pair not in words:
+                words[pair] = words[(first, second)] + [symbol]
+                queue.append(pair)
+
+    return None
+
+
+def compareMachines(machineType, firstFileName, secondFileName):
+    mealy = machineType == "mealy"
+    read = readMealy if mealy else readMoore
+    difference = findTraceDifference(read(firstFileName), read(secondFileName), mealy)
+    if difference is None:
+        print("Equivalent")
+        return True
+    print(f"Not equivalent, traces differ on: {' '.join(difference) or 'ε'}")
+    return False
+
+
 def removeUnreachableStates(states, inputSymbols, transitions, outputs, initialState):
     reachableStates = set()
     toVisit = [initialState]
@@ -101,12 +361,26 @@ def removeUnreachableStates(states, inputSymbols, transitions, outputs, initialS
     return list(filter(lambda x: x in reachableStates, states)), inputSymbols, transitions, outputs, initialState
 
 
+def getSymbolClasses(states, inputSymbols, transitions, outputs=None):
+    classes = {}
+    for symbol in inputSymbols:
+        column = tuple(transitions[state][symbol] for state in states)
+        if outputs is not None:
+            column += tuple(outputs[state][symbol] for state in states)
+        classes.setdefault(column, []).append(symbol)
+
+    symbolClasses = list(classes.values())
+    symbolClass = {symbol: i for i, symbols in enumerate(symbolClasses) for symbol in symbols}
+    return symbolClasses, symbolClass
+
+
 def minimizeMealy(states, inputSymbols, transitions, outputs, initialState):
+    symbolClasses, _ = getSymbolClasses(states, inputSymbols, transitions, outputs)
+    classSymbols = [symbols[0] for symbols in symbolClasses]
+
     outputGroups = {}
     for state in states:
-        output = ""
-        for symbol in inputSymbols:
-            output += outputs[state][symbol]
+        output = tuple(outputs[state][symbol] for symbol in classSymbols)
         outputGroups.setdefault(output, set()).add(state)
 
     partitions = list(outputGroups.values())
@@ -117,8 +391,8 @@ def minimizeMealy(states, inputSymbols, transitions, outputs, initialState):
             subgroup = {}
             for state in group:
                 key = ""
-                for symbol in inputSymbols:
-                    key += str(next((i for i, s in enumerate(partitions) if transitions[state][symbol] in s)))
+                for symbol in classSymbols:
+                    key += str(next((i for i, s in enumerate(partitions) if transitions[state][symbol] in s))) + ","
                 subgroup.setdefault(key, set()).add(state)
             newPartitions.extend(subgroup.values())
         return newPartitions
@@ -158,6 +432,9 @@ def minimizeMealy(states, inputSymbols, transitions, outputs, initialState):
 
 
 def minimizeMoore(states, inputSymbols, transitions, outputs, initialState):
+    symbolClasses, _ = getSymbolClasses(states, inputSymbols, transitions)
+    classSymbols = [symbols[0] for symbols in symbolClasses]
+
     outputGroups = {}
     for state in states:
         output = outputs[state]
@@ -171,10 +448,10 @@ def minimizeMoore(states, inputSymbols, transitions, outputs, initialState):
             subgroup = {}
             for state in group:
                 key = ""
-                for symbol in inputSymbols:
+                for classId, symbol in enumerate(classSymbols):
                     for i, s in enumerate(partitions):
                         if transitions[state][symbol] in s:
-                            key += symbol + str(i)
+                            key += f"{classId}:{i},"
                 subgroup.setdefault(key, set()).add(state)
             newPartitions.extend(subgroup.values())
         return newPartitions
@@ -211,13 +488,35 @@ def minimizeMoore(states, inputSymbols, transitions, outputs, initialState):
 
 
 def main():
-    if len(sys.argv) != 4:
-        print(f"Usage: {sys.argv[0]} <machine-type> <input-file> <output-file>")
+    if len(sys.argv) > 1 and sys.argv[1] == "compare":
+        if len(sys.argv) != 5 or sys.argv[2] not in ("mealy", "moore"):
+            print(f"Usage: {sys.argv[0]} compare <machine-type> <machine-file> <machine-file>")
+            return 1
+        try:
+            return 0 if compareMachines(*sys.argv[2:]) else 1
+        except RuntimeError as e:
+            print(e)
+            return 1
+
+    if len(sys.argv) > 1 and sys.argv[1] == "replay":
+        if len(sys.argv) != 6 or sys.argv[2] not in ("mealy", "moore"):
+            print(f"Usage: {sys.argv[0]} replay <machine-type> <machine-file> <log-file> <output-file>")
+            return 1
+        try:
+            replay(*sys.argv[2:])
+        except RuntimeError as e:
+            print(e)
+            return 1
+        return 0
+
+    if len(sys.argv) not in (4, 5):
+        print(f"Usage: {sys.argv[0]} <machine-type> <input-file> <output-file> [<generated-module>]")
         return 1
 
     machineType = sys.argv[1]
     inputFileName = sys.argv[2]
     outputFileName = sys.argv[3]
+    moduleFileName = sys.argv[4] if len(sys.argv) == 5 else None
 
     try:
         if machineType == "mealy":
@@ -225,11 +524,15 @@ def main():
             values = removeUnreachableStates(*values)
             values = minimizeMealy(*values)
             writeMealy(outputFileName, *values)
+            if moduleFileName:
+                generateMealy(moduleFileName, *values)
         elif machineType == "moore":
             values = readMoore(inputFileName)
             values = removeUnreachableStates(*values)
             values = minimizeMoore(*values)
             writeMoore(outputFileName, *values)
+            if moduleFileName:
+                generateMoore(moduleFileName, *values)
         else:
             print(f"Unknown machine type: {machineType}")
             return 1
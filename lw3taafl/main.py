@@ -1,6 +1,17 @@
 import re
 import sys
 
+RIGHT_LINEAR_GRAMMAR_PATTERN = re.compile(
+    r"^\s*<(\w+)>\s*->\s*([\wε](?:\s+<\w+>)?(?:\s*\|\s*[\wε](?:\s+<\w+>)?)*)\s*$",
+    re.MULTILINE
+)
+RIGHT_LINEAR_TRANSITION_PATTERN = re.compile(r"^\s*([\wε]*)\s*(?:<(\w*)>)?\s*$")
+LEFT_LINEAR_GRAMMAR_PATTERN = re.compile(
+    r"^\s*<(\w+)>\s*->\s*((?:<\w+>\s+)?[\wε](?:\s*\|\s*(?:<\w+>\s+)?[\wε])*)\s*$",
+    re.MULTILINE
+)
+LEFT_LINEAR_TRANSITION_PATTERN = re.compile(r"^\s*(?:<(\w*)>)?\s*([\wε]*)\s*$")
+
 def readFileToString(filename):
     try:
         with open(filename, "r", encoding="utf-8") as file:
@@ -18,11 +29,8 @@ def processGrammar(inputFilename, outputFilename):
 
 
 def parseRightLinearGrammar(content):
-    grammarPattern = re.compile(
-        r"^\s*<(\w+)>\s*->\s*([\wε](?:\s+<\w+>)?(?:\s*\|\s*[\wε](?:\s+<\w+>)?)*)\s*$",
-        re.MULTILINE
-    )
-    transitionPattern = re.compile(r"^\s*([\wε]*)\s*(?:<(\w*)>)?\s*$")
+    grammarPattern = RIGHT_LINEAR_GRAMMAR_PATTERN
+    transitionPattern = RIGHT_LINEAR_TRANSITION_PATTERN
 
     grammar = {}
     initialState = None
@@ -54,11 +62,8 @@ def parseRightLinearGrammar(content):
 
 
 def parseLeftLinearGrammar(content):
-    grammarPattern = re.compile(
-        r"^\s*<(\w+)>\s*->\s*((?:<\w+>\s+)?[\wε](?:\s*\|\s*(?:<\w+>\s+)?[\wε])*)\s*$",
-        re.MULTILINE
-    )
-    transitionPattern = re.compile(r"^\s*(?:<(\w*)>)?\s*([\wε]*)\s*$")
+    grammarPattern = LEFT_LINEAR_GRAMMAR_PATTERN
+    transitionPattern = LEFT_LINEAR_TRANSITION_PATTERN
 
     grammar = {}
     finiteState = None
@@ -119,17 +124,9 @@ def generateCsvFile(grammar, outputFileName, initialState="H"):
 
 
 def getParser(text):
-    pattern = re.compile(
-        r"^\s*<(\w+)>\s*->\s*([\wε](?:\s+<\w+>)?(?:\s*\|\s*[\wε](?:\s+<\w+>)?)*)\s*$",
-        re.MULTILINE
-    )
-    if len(re.findall(pattern, text)) == text.count('->'):
+    if len(RIGHT_LINEAR_GRAMMAR_PATTERN.findall(text)) == text.count('->'):
         return parseRightLinearGrammar
-    pattern = re.compile(
-        r"^\s*<(\w+)>\s*->\s*((?:<\w+>\s+)?[\wε](?:\s*\|\s*(?:<\w+>\s+)?[\wε])*)\s*$",
-        re.MULTILINE
-    )
-    if len(re.findall(pattern, text)) == text.count('->'):
+    if len(LEFT_LINEAR_GRAMMAR_PATTERN.findall(text)) == text.count('->'):
         return parseLeftLinearGrammar
     return parseLeftLinearGrammar
 
@@ -1,7 +1,46 @@
 import csv
+import re
 import sys
 
 
+RANGE_LABEL_PATTERN = re.compile(
+    r"^(\\u[0-9a-f]{4}|\\U[0-9a-f]{8}|.)(?:-(\\u[0-9a-f]{4}|\\U[0-9a-f]{8}|.))?$",
+    re.DOTALL
+)
+
+DFA_MODULE_TEMPLATE = """from bisect import bisect_right
+
+SYMBOLS = {symbols!r}
+WIDTH = {width!r}
+DEAD = {dead!r}
+TRANSITIONS = {table}
+FINAL = {final!r}
+RANGE_STARTS = {rangeStarts!r}
+RANGE_ENDS = {rangeEnds!r}
+RANGE_CLASSES = {rangeClasses!r}
+
+
+def run(iterable):
+    symbols = SYMBOLS
+    transitions = TRANSITIONS
+    state = 0
+    for symbol in iterable:
+        symbolClass = symbols.get(symbol)
+        if symbolClass is None:
+            if len(symbol) != 1:
+                return False
+            code = ord(symbol)
+            index = bisect_right(RANGE_STARTS, code) - 1
+            if index < 0 or RANGE_ENDS[index] < code:
+                return False
+            symbolClass = RANGE_CLASSES[index]
+        state = transitions[state * WIDTH + symbolClass]
+        if state == DEAD:
+            return False
+    return bool(FINAL[state])
+"""
+
+
 def readMachineFromFile(filename):
     finiteState = None
     states = []
@@ -25,6 +64,94 @@ def readMachineFromFile(filename):
     return states[0], finiteState, machine
 
 
+def readDfaFromFile(filename):
+    machine = {}
+    with open(filename, "r", newline="", encoding="utf-8") as csvfile:
+        reader = csv.reader(csvfile, delimiter=";")
+        finiteMarkers = next(reader)[1:]
+        states = next(reader)[1:]
+        for state, marker in zip(states, finiteMarkers):
+            machine[state] = {
+                "is_finite": marker == "F",
+                "transitions": {}
+            }
+        for row in reader:
+            symbol = row[0]
+            for state, transition in zip(states, row[1:]):
+                machine[state]["transitions"][symbol] = transition
+
+    return states[0], machine
+
+
+def findDifference(firstInitialState, firstMachine, secondInitialState, secondMachine):
+    symbols = sorted({symbol for machine in (firstMachine, secondMachine)
+                      for state in machine for symbol in machine[state]["transitions"]})
+
+    def isFinite(machine, state):
+        return bool(state) and machine[state]["is_finite"]
+
+    def getNext(machine, state, symbol):
+        return machine[state]["transitions"].get(symbol, "") if state else ""
+
+    start = (firstInitialState, secondInitialState)
+    words = {start: []}
+    queue = [start]
+    for first, second in queue:
+        if isFinite(firstMachine, first) != isFinite(secondMachine, second):
+            return words[(first, second)]
+        for symbol in symbols:
+            pair = (getNext(firstMachine, first, symbol), getNext(secondMachine, second, symbol))
+            if pair not in words:
+                words[pair] = words[(first, second)] + [symbol]
+                queue.append(pair)
+
+    return None
+
+
+def formatChar(code):
+    char = chr(code)
+    if char.isprintable():
+        return char
+    if code <= 0xFFFF:
+        return f"\\u{code:04x}"
+    return f"\\U{code:08x}"
+
+
+def alignRangeLabels(firstMachine, secondMachine):
+    labels = {symbol for machine in (firstMachine, secondMachine)
+              for state in machine for symbol in machine[state]["transitions"]}
+    ranges = {label: parseRangeLabel(label) for label in labels}
+    if None in ranges.values():
+        return firstMachine, secondMachine
+
+    bounds = sorted({bound for start, end in ranges.values() for bound in (start, end + 1)})
+    boundIndex = {bound: i for i, bound in enumerate(bounds)}
+    alignedMachines = []
+    for machine in (firstMachine, secondMachine):
+        alignedMachine = {}
+        for state in machine:
+            transitions = {}
+            for label, transition in machine[state]["transitions"].items():
+                start, end = ranges[label]
+                for bound in bounds[boundIndex[start]:boundIndex[end + 1]]:
+                    transitions[formatChar(bound)] = transition
+            alignedMachine[state] = {"is_finite": machine[state]["is_finite"], "transitions": transitions}
+        alignedMachines.append(alignedMachine)
+    return alignedMachines
+
+
+def compareMachines(first, second):
+    firstInitialState, firstMachine = readDfaFromFile(first)
+    secondInitialState, secondMachine = readDfaFromFile(second)
+    firstMachine, secondMachine = alignRangeLabels(firstMachine, secondMachine)
+    difference = findDifference(firstInitialState, firstMachine, secondInitialState, secondMachine)
+    if difference is None:
+        print("Equivalent")
+        return True
+    print(f"Not equivalent, differ on: {' '.join(difference) or 'ε'}")
+    return False
+
+
 def fillEpsilon(machine):
     epsilon = {}
 
@@ -71,7 +198,26 @@ def findKeyWithValue(dictionary, newValue):
     return None
 
 
+def getTransitionKey(transition):
+    if isinstance(transition, list):
+        return tuple(sorted(transition))
+    return transition
+
+
+def getSymbolClasses(machine, symbols):
+    classes = {}
+    for symbol in symbols:
+        column = tuple(getTransitionKey(machine[state]["transitions"][symbol]) for state in machine)
+        classes.setdefault(column, []).append(symbol)
+
+    symbolClasses = list(classes.values())
+    symbolClass = {symbol: i for i, symbols in enumerate(symbolClasses) for symbol in symbols}
+    return symbolClasses, symbolClass
+
+
 def createNew(initialState, finiteState, epsilon, machine):
+    symbols = list(filter(lambda x: x != "ε", machine[initialState]["transitions"]))
+    symbolClasses, _ = getSymbolClasses(machine, symbols)
     count = 0
     stateDependencies = {"s0": [initialState]}
     states = ["s0"]
@@ -83,10 +229,10 @@ def createNew(initialState, finiteState, epsilon, machine):
             "transitions": {}
         }
 
-        for symbol in filter(lambda x: x != "ε", machine[initialState]["transitions"]):
+        for classSymbols in symbolClasses:
             transitions = []
             for dependency in getDependencies(stateDependencies[state], epsilon):
-                transitions.extend(machine[dependency]["transitions"][symbol])
+                transitions.extend(machine[dependency]["transitions"][classSymbols[0]])
             transitions = list(set(transitions))
             key = ''
             if len(transitions) != 0:
@@ -96,15 +242,233 @@ def createNew(initialState, finiteState, epsilon, machine):
                 key = f"s{count}"
                 states.append(key)
                 stateDependencies[key] = transitions
-            newMachine[state]["transitions"][symbol] = key
+            for symbol in classSymbols:
+                newMachine[state]["transitions"][symbol] = key
+
+    return newMachine
+
 
+def getMachineFingerprint(initialState, finiteState, machine):
+    import hashlib
+    import json
+
+    content = json.dumps([initialState, finiteState, machine], sort_keys=True)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def createNewSpilled(initialState, finiteState, epsilon, machine, storeFilename, memoryBudget=100000,
+                     checkpointInterval=1000):
+    import json
+    import sqlite3
+
+    symbols = list(filter(lambda x: x != "ε", machine[initialState]["transitions"]))
+    symbolClasses, _ = getSymbolClasses(machine, symbols)
+    fingerprint = getMachineFingerprint(initialState, finiteState, machine)
+
+    connection = sqlite3.connect(storeFilename)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS states ("
+        "position INTEGER PRIMARY KEY, subset TEXT UNIQUE NOT NULL, is_finite INTEGER)"
+    )
+    connection.execute("CREATE TABLE IF NOT EXISTS classes (class INTEGER PRIMARY KEY, symbols TEXT NOT NULL)")
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS transitions ("
+        "class INTEGER, position INTEGER, target INTEGER, PRIMARY KEY (class, position)) WITHOUT ROWID"
+    )
+
+    storedFingerprint = connection.execute("SELECT value FROM meta WHERE key = 'fingerprint'").fetchone()
+    if storedFingerprint is None:
+        if connection.execute("SELECT COUNT(*) FROM states").fetchone()[0]:
+            connection.close()
+            raise RuntimeError(f"State store {storeFilename} has no input fingerprint, refusing to resume")
+        connection.execute("INSERT INTO meta (key, value) VALUES ('fingerprint', ?)", (fingerprint,))
+        connection.executemany(
+            "INSERT INTO classes (class, symbols) VALUES (?, ?)",
+            ((classId, json.dumps(classSymbols)) for classId, classSymbols in enumerate(symbolClasses))
+        )
+        connection.execute("INSERT INTO states (position, subset) VALUES (0, ?)", (json.dumps([initialState]),))
+        connection.commit()
+    elif storedFingerprint[0] != fingerprint:
+        connection.close()
+        raise RuntimeError(f"State store {storeFilename} was built from a different machine")
+
+    position = connection.execute("SELECT MIN(position) FROM states WHERE is_finite IS NULL").fetchone()[0]
+    count = connection.execute("SELECT MAX(position) FROM states").fetchone()[0]
+    subsetIndex = {}
+    processed = 0
+
+    while position is not None and position <= count:
+        subset = json.loads(connection.execute(
+            "SELECT subset FROM states WHERE position = ?", (position,)
+        ).fetchone()[0])
+        dependencies = getDependencies(subset, epsilon)
+        rowTransitions = []
+
+        for classId, classSymbols in enumerate(symbolClasses):
+            transitions = set()
+            for dependency in dependencies:
+                transitions.update(machine[dependency]["transitions"][classSymbols[0]])
+            target = None
+            if len(transitions) != 0:
+                subsetKey = json.dumps(sorted(transitions))
+                target = subsetIndex.get(subsetKey)
+                if target is None:
+                    found = connection.execute("SELECT position FROM states WHERE subset = ?", (subsetKey,)).fetchone()
+                    if found is None:
+                        count += 1
+                        connection.execute("INSERT INTO states (position, subset) VALUES (?, ?)", (count, subsetKey))
+                        target = count
+                    else:
+                        target = found[0]
+                    if len(subsetIndex) >= memoryBudget:
+                        subsetIndex.clear()
+                    subsetIndex[subsetKey] = target
+            rowTransitions.append((classId, position, target))
+
+        connection.executemany(
+            "INSERT OR REPLACE INTO transitions (class, position, target) VALUES (?, ?, ?)", rowTransitions
+        )
+        connection.execute(
+            "UPDATE states SET is_finite = ? WHERE position = ?", (finiteState in dependencies, position)
+        )
+        processed += 1
+        if processed % checkpointInterval == 0:
+            connection.commit()
+        position += 1
+
+    connection.commit()
+    return connection
+
+
+def readStoreClasses(connection):
+    import json
+
+    return [
+        (classId, json.loads(symbols))
+        for classId, symbols in connection.execute("SELECT class, symbols FROM classes ORDER BY class")
+    ]
+
+
+def readStoreColumn(connection, classId):
+    return [
+        f"s{target}" if target is not None else ""
+        for target, in connection.execute(
+            "SELECT target FROM transitions WHERE class = ? ORDER BY position", (classId,))
+    ]
+
+
+def readStore(connection):
+    newMachine = {}
+    for position, isFinite in connection.execute("SELECT position, is_finite FROM states ORDER BY position"):
+        newMachine[f"s{position}"] = {
+            "is_finite": bool(isFinite),
+            "transitions": {}
+        }
+    states = list(newMachine)
+
+    for classId, classSymbols in readStoreClasses(connection):
+        for state, target in zip(states, readStoreColumn(connection, classId)):
+            for symbol in classSymbols:
+                newMachine[state]["transitions"][symbol] = target
     return newMachine
 
-def processMachine(input, output):
+
+def writeStore(connection, filename):
+    with open(filename, "w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.writer(csvfile, delimiter=";")
+        writer.writerow([""] + [
+            "F" if isFinite else "" for isFinite, in connection.execute(
+                "SELECT is_finite FROM states ORDER BY position")
+        ])
+        writer.writerow([""] + [
+            f"s{position}" for position, in connection.execute("SELECT position FROM states ORDER BY position")
+        ])
+        for classId, classSymbols in readStoreClasses(connection):
+            column = readStoreColumn(connection, classId)
+            for symbol in classSymbols:
+                writer.writerow([symbol] + column)
+
+
+def processMachine(input, output, module=None, store=None, memoryBudget=100000):
     initialState, finiteState, machine = readMachineFromFile(input)
     epsilon = fillEpsilon(machine)
+    if store:
+        connection = createNewSpilled(initialState, finiteState, epsilon, machine, store, memoryBudget)
+        try:
+            writeStore(connection, output)
+            if module:
+                generatePython(readStore(connection), module)
+        finally:
+            connection.close()
+        return
+
     newMachine = createNew(initialState, finiteState, epsilon, machine)
     write(newMachine, output)
+    if module:
+        generatePython(newMachine, module)
+
+def parseChar(text):
+    if len(text) == 1:
+        return ord(text)
+    return int(text[2:], 16)
+
+
+def parseRangeLabel(label):
+    match = RANGE_LABEL_PATTERN.match(label)
+    if match is None:
+        return None
+    start = parseChar(match.group(1))
+    end = parseChar(match.group(2)) if match.group(2) else start
+    return start, end
+
+
+def generatePython(machine, filename):
+    states = list(machine)
+    stateIndex = {state: i for i, state in enumerate(states)}
+    dead = len(states)
+    symbols = list(machine[states[0]]["transitions"])
+
+    symbolClasses, symbolClass = getSymbolClasses(machine, symbols)
+
+    table = []
+    for state in states:
+        for classSymbols in symbolClasses:
+            transition = machine[state]["transitions"][classSymbols[0]]
+            table.append(stateIndex[transition] if transition else dead)
+
+    symbolLookup = {}
+    ranges = []
+    for symbol in symbols:
+        labelRange = parseRangeLabel(symbol)
+        if labelRange is None:
+            symbolLookup[symbol] = symbolClass[symbol]
+        elif labelRange[0] == labelRange[1]:
+            symbolLookup[chr(labelRange[0])] = symbolClass[symbol]
+        else:
+            ranges.append((*labelRange, symbolClass[symbol]))
+    ranges.sort()
+
+    if dead < 256:
+        formattedTable = repr(bytes(table))
+    else:
+        from array import array
+        formattedTable = f"memoryview({array('I', table).tobytes()!r}).cast('I')"
+
+    with open(filename, "w", encoding="utf-8") as f:
+        f.write(DFA_MODULE_TEMPLATE.format(
+            symbols=symbolLookup,
+            width=len(symbolClasses),
+            dead=dead,
+            table=formattedTable,
+            final=bytes(1 if machine[state]["is_finite"] else 0 for state in states),
+            rangeStarts=[start for start, _, _ in ranges],
+            rangeEnds=[end for _, end, _ in ranges],
+            rangeClasses=[classId for _, _, classId in ranges],
+        ))
+
 
 def write(machine, filename):
     symbols = set()
@@ -131,15 +495,39 @@ def write(machine, filename):
             writer.writerow(row)
 
 def main():
-    if len(sys.argv) != 3:
-        print(f"Usage: {sys.argv[0]} <input-file> <output-file>")
+    if len(sys.argv) > 1 and sys.argv[1] == "compare":
+        if len(sys.argv) != 4:
+            print(f"Usage: {sys.argv[0]} compare <dfa-file> <dfa-file>")
+            return 1
+        try:
+            return 0 if compareMachines(sys.argv[2], sys.argv[3]) else 1
+        except RuntimeError as e:
+            print(e)
+            return 1
+
+    args = []
+    options = {}
+    for arg in sys.argv[1:]:
+        if arg.startswith("--"):
+            name, _, value = arg[2:].partition("=")
+            options[name] = value
+        else:
+            args.append(arg)
+
+    if len(args) not in (2, 3) or not set(options) <= {"store", "budget"} \
+            or not options.get("budget", "1").isdecimal():
+        print(f"Usage: {sys.argv[0]} <input-file> <output-file> [<generated-module>] "
+              f"[--store=<state-store>] [--budget=<cached-subsets>]")
         return 1
 
-    input = sys.argv[1]
-    output = sys.argv[2]
+    input = args[0]
+    output = args[1]
+    module = args[2] if len(args) == 3 else None
+    store = options.get("store")
+    memoryBudget = int(options.get("budget", 100000))
 
     try:
-        processMachine(input, output)
+        processMachine(input, output, module, store, memoryBudget)
     except RuntimeError as e:
         print(e)
         return 1
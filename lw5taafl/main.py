@@ -1,12 +1,18 @@
+import bisect
 import csv
 import sys
+from collections import deque
+
+
+MAX_CODEPOINT = 0x10FFFF
 
 
 class RegexNode:
-    def __init__(self, value, left=None, right=None):
+    def __init__(self, value, left=None, right=None, ranges=None):
         self.value = value
         self.left = left
         self.right = right
+        self.ranges = ranges
 
     def __repr__(self):
         return f"RegexNode({self.value})"
@@ -33,24 +39,153 @@ class NFA:
 
 
 def isLiteral(value):
-    return value not in "+*()|"
+    return value not in "+*?()|[.{"
+
+
+def mergeRanges(ranges):
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return tuple(merged)
+
+
+def invertRanges(ranges):
+    inverted = []
+    start = 0
+    for rangeStart, rangeEnd in ranges:
+        if rangeStart > start:
+            inverted.append((start, rangeStart - 1))
+        start = rangeEnd + 1
+    if start <= MAX_CODEPOINT:
+        inverted.append((start, MAX_CODEPOINT))
+    return tuple(inverted)
+
+
+def partitionRanges(labels):
+    covered = mergeRanges(r for label in labels for r in label)
+    coveredStarts = [start for start, _ in covered]
+    bounds = sorted({bound for label in labels for start, end in label for bound in (start, end + 1)})
+
+    intervals = []
+    for start, nextStart in zip(bounds, bounds[1:]):
+        index = bisect.bisect_right(coveredStarts, start) - 1
+        if index >= 0 and covered[index][1] >= start:
+            intervals.append((start, nextStart - 1))
+    return intervals
+
+
+def formatChar(code):
+    char = chr(code)
+    if char.isprintable():
+        return char
+    if code <= 0xFFFF:
+        return f"\\u{code:04x}"
+    return f"\\U{code:08x}"
+
+
+def formatRange(start, end):
+    if start == end:
+        return formatChar(start)
+    return f"{formatChar(start)}-{formatChar(end)}"
+
+
+def formatRanges(ranges):
+    return "".join(formatRange(start, end) for start, end in ranges)
+
+
+def createLiteral(char):
+    return RegexNode(char, ranges=((ord(char), ord(char)),))
+
+
+def concatNodes(nodes):
+    if not nodes:
+        return RegexNode("empty")
+    if len(nodes) == 1:
+        return nodes[0]
+    middle = len(nodes) // 2
+    return RegexNode("concat", left=concatNodes(nodes[:middle]), right=concatNodes(nodes[middle:]))
+
+
+def repeatNode(node, minCount, maxCount):
+    nodes = [node] * minCount
+    if maxCount is None:
+        nodes.append(RegexNode("multiply", left=node))
+    else:
+        nodes.extend([RegexNode("optional", left=node)] * (maxCount - minCount))
+    return concatNodes(nodes)
 
 
 def parseRegex(expression):
     def parse(tokens):
         def getNext():
-            return tokens.pop(0) if tokens else None
+            return tokens.popleft() if tokens else None
+
+        def getClassChar():
+            token = getNext()
+            if token == "\\":
+                token = getNext()
+            if token is None:
+                raise ValueError("Unterminated character class")
+            return ord(token)
+
+        def parseClass():
+            negate = bool(tokens) and tokens[0] == "^"
+            if negate:
+                getNext()
+            ranges = []
+            while not ranges or tokens[0] != "]":
+                if not tokens:
+                    raise ValueError("Unterminated character class")
+                start = getClassChar()
+                end = start
+                if len(tokens) > 1 and tokens[0] == "-" and tokens[1] != "]":
+                    getNext()
+                    end = getClassChar()
+                    if end < start:
+                        raise ValueError(f"Invalid range: {chr(start)}-{chr(end)}")
+                ranges.append((start, end))
+                if not tokens:
+                    raise ValueError("Unterminated character class")
+            getNext()
+            ranges = mergeRanges(ranges)
+            if negate:
+                ranges = invertRanges(ranges)
+            return RegexNode(f"[{formatRanges(ranges)}]", ranges=ranges)
+
+        def parseBounds():
+            text = ""
+            while tokens and tokens[0] != "}":
+                text += getNext()
+            if getNext() != "}":
+                raise ValueError("Unterminated repetition")
+            lower, comma, upper = text.partition(",")
+            if not lower.isdecimal() or (upper and not upper.isdecimal()):
+                raise ValueError(f"Invalid repetition: {{{text}}}")
+            minCount = int(lower)
+            maxCount = minCount
+            if comma:
+                maxCount = int(upper) if upper else None
+            if maxCount is not None and maxCount < minCount:
+                raise ValueError(f"Invalid repetition: {{{text}}}")
+            return minCount, maxCount
 
         def parsePrimary():
             token = getNext()
             if token == "\\":
                 escaped = getNext()
                 if isLiteral(escaped):
-                    tokens.insert(0, escaped)
+                    tokens.appendleft(escaped)
                 else:
-                    return RegexNode(escaped)
+                    return createLiteral(escaped)
+            if token == "[":
+                return parseClass()
+            if token == ".":
+                return RegexNode(".", ranges=((0, MAX_CODEPOINT),))
             if isLiteral(token):
-                return RegexNode(token)
+                return createLiteral(token)
             elif token == "(":
                 node = parseExpression()
                 if getNext() != ")":
@@ -60,14 +195,22 @@ def parseRegex(expression):
 
         def parseFactor():
             node = parsePrimary()
-            while tokens and tokens[0] in ("*", "+"):
-                op = "multiply" if getNext() == "*" else "add"
-                node = RegexNode(op, left=node)
+            while tokens and tokens[0] in ("*", "+", "?", "{"):
+                op = getNext()
+                if op == "*":
+                    node = RegexNode("multiply", left=node)
+                elif op == "+":
+                    node = RegexNode("add", left=node)
+                elif op == "?":
+                    node = RegexNode("optional", left=node)
+                else:
+                    minCount, maxCount = parseBounds()
+                    node = repeatNode(node, minCount, maxCount)
             return node
 
         def parseTerm():
             node = parseFactor()
-            while tokens and tokens[0] and (isLiteral(tokens[0]) or tokens[0] == "("):
+            while tokens and tokens[0] and (isLiteral(tokens[0]) or tokens[0] in ("(", "[", ".")):
                 right = parseFactor()
                 node = RegexNode("concat", left=node, right=right)
             return node
@@ -82,11 +225,7 @@ def parseRegex(expression):
 
         return parseExpression()
 
-    tokens = []
-    for char in expression:
-        tokens.append(char)
-
-    return parse(tokens)
+    return parse(deque(expression))
 
 
 def printTree(node, level=0):
@@ -100,10 +239,15 @@ def buildNfa(node):
     if node is None:
         return None
 
-    if node.value not in ("concat", "or", "add", "multiply"):
+    if node.ranges is not None:
+        start = State()
+        accept = State()
+        start.addTransition(node.ranges, accept)
+        return NFA(start, accept)
+    elif node.value == "empty":
         start = State()
         accept = State()
-        start.addTransition(node.value, accept)
+        start.addEpsilonTransition(accept)
         return NFA(start, accept)
     elif node.value == "concat":
         left = buildNfa(node.left)
@@ -137,6 +281,14 @@ def buildNfa(node):
         sub.acceptState.addEpsilonTransition(sub.startState)
         sub.acceptState.addEpsilonTransition(accept)
         return NFA(start, accept)
+    elif node.value == "optional":
+        start = State()
+        accept = State()
+        sub = buildNfa(node.left)
+        start.addEpsilonTransition(sub.startState)
+        start.addEpsilonTransition(accept)
+        sub.acceptState.addEpsilonTransition(accept)
+        return NFA(start, accept)
 
     raise ValueError(f"Unexpected node value: {node.value}")
 
@@ -148,7 +300,7 @@ def printNfa(nfa):
         visited.add(state)
         for symbol, states in state.transitions.items():
             for s in states:
-                print(f"    S{stateIndex[state]}-- {symbol} -->S{stateIndex[s]}")
+                print(f"    S{stateIndex[state]}-- {formatRanges(symbol)} -->S{stateIndex[s]}")
                 printState(s, visited, stateIndex)
         for s in state.epsilonTransitions:
             print(f"    S{stateIndex[state]}-- ε -->S{stateIndex[s]}")
@@ -202,17 +354,24 @@ def writeNfa(nfa, output):
 
     transitions = {stateIndex[s]: {} for s in stateIndex}
 
+    labels = {label for state in stateIndex for label in state.transitions}
+    intervals = partitionRanges(labels)
+    intervalStarts = [start for start, _ in intervals]
+
     for state, name in stateIndex.items():
-        for symbol, states in state.transitions.items():
-            transitions[name].setdefault(symbol, set()).update(stateIndex[s] for s in states)
+        for label, states in state.transitions.items():
+            targets = {stateIndex[s] for s in states}
+            for rangeStart, rangeEnd in label:
+                first = bisect.bisect_left(intervalStarts, rangeStart)
+                last = bisect.bisect_right(intervalStarts, rangeEnd)
+                for interval in intervals[first:last]:
+                    transitions[name].setdefault(interval, set()).update(targets)
         for s in state.epsilonTransitions:
             transitions[name].setdefault("ε", set()).add(stateIndex[s])
 
-    symbols = set()
-    for state in transitions:
-        trans = transitions[state]
-        for symbol in trans:
-            symbols.add(symbol)
+    symbols = list(intervals)
+    if any("ε" in trans for trans in transitions.values()):
+        symbols.append("ε")
 
     with open(output, "w", newline="", encoding="utf-8") as csvfile:
         writer = csv.writer(csvfile, delimiter=";")
@@ -220,7 +379,7 @@ def writeNfa(nfa, output):
         writer.writerow([""] + [state for state in stateIndex.values()])
 
         for symbol in symbols:
-            row = [symbol]
+            row = ["ε" if symbol == "ε" else formatRange(*symbol)]
             for state in stateIndex.values():
                 row.append(",".join(transitions.get(state, {}).get(symbol, {})))
             writer.writerow(row)
@@ -0,0 +1,24 @@
+import importlib
+import sys
+
+COMMANDS = {
+    "minimize": "lw2taafl.main",
+    "grammar": "lw3taafl.main",
+    "determinize": "lw4taafl.main",
+    "regex": "lw5taafl.main",
+}
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in COMMANDS:
+        print(f"Usage: python -m taafl <{'|'.join(COMMANDS)}> [<args>...]")
+        return 1
+
+    command = sys.argv[1]
+    module = importlib.import_module(COMMANDS[command])
+    sys.argv = [f"taafl {command}"] + sys.argv[2:]
+    return module.main()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
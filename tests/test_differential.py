@@ -0,0 +1,295 @@
+import gc
+import importlib.util
+import itertools
+import os
+import random
+import re
+import shutil
+import tempfile
+import time
+import unittest
+
+from lw2taafl import main as lw2
+from lw3taafl import main as lw3
+from lw4taafl import main as lw4
+from lw5taafl import main as lw5
+
+SEED = 2024
+ROUNDS = 40
+WORD_ALPHABET = "abcd"
+WORD_LENGTH = 4
+TIMING_RUNS = 5
+SCALING_ATTEMPTS = 3
+LINEAR_RATIO = 3.2
+QUADRATIC_RATIO = 5.5
+
+
+def loadModule(filename):
+    name = os.path.splitext(os.path.basename(filename))[0]
+    spec = importlib.util.spec_from_file_location(name, filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def getWords(alphabet=WORD_ALPHABET, length=WORD_LENGTH):
+    for size in range(length + 1):
+        for word in itertools.product(alphabet, repeat=size):
+            yield "".join(word)
+
+
+def createMachine(rng, mealy):
+    states = [f"q{i}" for i in range(rng.randint(1, 8))]
+    inputSymbols = [f"x{i}" for i in range(rng.randint(1, 4))]
+    outputSymbols = [f"y{i}" for i in range(rng.randint(1, 3))]
+    transitions = {state: {symbol: rng.choice(states) for symbol in inputSymbols} for state in states}
+    if mealy:
+        outputs = {state: {symbol: rng.choice(outputSymbols) for symbol in inputSymbols} for state in states}
+    else:
+        outputs = {state: rng.choice(outputSymbols) for state in states}
+    return states, inputSymbols, transitions, outputs, states[0]
+
+
+def createNfa(rng):
+    states = [f"q{i}" for i in range(rng.randint(1, 7))]
+    finiteState = rng.choice(states)
+    machine = {}
+    for state in states:
+        machine[state] = {"is_finite": state == finiteState, "transitions": {}}
+        for symbol in ("a", "b", "c", "ε"):
+            count = rng.choice((0, 0, 1)) if symbol == "ε" else rng.randint(0, 2)
+            machine[state]["transitions"][symbol] = rng.sample(states, min(count, len(states)))
+    return states[0], finiteState, machine
+
+
+def createChainNfa(size, symbol):
+    machine = {f"q{i}": {"is_finite": False, "transitions": {"a": [], "ε": []}} for i in range(size)}
+    for i in range(size - 1):
+        machine[f"q{i}"]["transitions"][symbol].append(f"q{i + 1}")
+    machine[f"q{size - 1}"]["is_finite"] = True
+    return "q0", f"q{size - 1}", machine
+
+
+def createRegex(rng, depth=3):
+    if depth == 0 or rng.random() < 0.3:
+        return rng.choice(("a", "b", "c", ".", "[ab]", "[^a]", "[b-d]", "[a-bd]"))
+    kind = rng.choice(("concat", "or", "repeat"))
+    if kind == "concat":
+        return createRegex(rng, depth - 1) + createRegex(rng, depth - 1)
+    if kind == "or":
+        return f"({createRegex(rng, depth - 1)}|{createRegex(rng, depth - 1)})"
+    quantifier = rng.choice(("*", "+", "?", "{2}", "{0,2}", "{1,3}", "{2,}"))
+    return f"({createRegex(rng, depth - 1)}){quantifier}"
+
+
+def createGrammar(rng):
+    nonterminals = ["S", "A", "B", "C"][:rng.randint(1, 4)]
+    rules = {}
+    for nonterminal in nonterminals:
+        alternatives = set()
+        for _ in range(rng.randint(1, 3)):
+            nextState = rng.choice(nonterminals + [None])
+            alternatives.add((rng.choice("abc"), nextState))
+        rules[nonterminal] = sorted(alternatives, key=lambda x: (x[0], x[1] or ""))
+    lines = []
+    for nonterminal in nonterminals:
+        alternatives = [symbol if nextState is None else f"{symbol} <{nextState}>"
+                        for symbol, nextState in rules[nonterminal]]
+        lines.append(f"<{nonterminal}> -> {' | '.join(alternatives)}")
+    return "\n".join(lines) + "\n", rules
+
+
+def acceptsGrammar(rules, word):
+    current = {"S"}
+    for char in word:
+        current = {nextState or "H" for state in current if state != "H"
+                   for symbol, nextState in rules[state] if symbol == char}
+    return bool(word) and "H" in current
+
+
+def acceptsNfa(initialState, finiteState, machine, word):
+    def close(states):
+        closure = set(states)
+        stack = list(states)
+        while stack:
+            for neighbor in machine[stack.pop()]["transitions"].get("ε", []):
+                if neighbor not in closure:
+                    closure.add(neighbor)
+                    stack.append(neighbor)
+        return closure
+
+    current = close({initialState})
+    for char in word:
+        current = close({target for state in current for target in machine[state]["transitions"][char]})
+    return finiteState in current
+
+
+def acceptsDfa(machine, word):
+    state = "s0"
+    for char in word:
+        state = machine[state]["transitions"][char]
+        if not state:
+            return False
+    return machine[state]["is_finite"]
+
+
+def measure(function, *args):
+    best = None
+    for _ in range(TIMING_RUNS):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            function(*args)
+            elapsed = time.perf_counter() - start
+        finally:
+            gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+class DifferentialTest(unittest.TestCase):
+    def setUp(self):
+        self.rng = random.Random(SEED)
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def getPath(self, name):
+        return os.path.join(self.directory, name)
+
+    def testMinimizeMealyIsTraceEquivalent(self):
+        for _ in range(ROUNDS):
+            machine = createMachine(self.rng, mealy=True)
+            minimized = lw2.minimizeMealy(*lw2.removeUnreachableStates(*machine))
+            self.assertIsNone(lw2.findTraceDifference(machine, minimized, True), machine)
+
+    def testMinimizeMooreIsTraceEquivalent(self):
+        for _ in range(ROUNDS):
+            machine = createMachine(self.rng, mealy=False)
+            minimized = lw2.minimizeMoore(*lw2.removeUnreachableStates(*machine))
+            self.assertIsNone(lw2.findTraceDifference(machine, minimized, False), machine)
+
+    def testFillEpsilonMatchesClosure(self):
+        for _ in range(ROUNDS):
+            _, _, machine = createNfa(self.rng)
+            epsilon = lw4.fillEpsilon(machine)
+            for state in machine:
+                closure = {state}
+                stack = [state]
+                while stack:
+                    for neighbor in machine[stack.pop()]["transitions"]["ε"]:
+                        if neighbor not in closure:
+                            closure.add(neighbor)
+                            stack.append(neighbor)
+                self.assertEqual(set(epsilon[state]), closure)
+
+    def testCreateNewMatchesSpilled(self):
+        for round in range(ROUNDS):
+            initialState, finiteState, machine = createNfa(self.rng)
+            epsilon = lw4.fillEpsilon(machine)
+            newMachine = lw4.createNew(initialState, finiteState, epsilon, machine)
+            connection = lw4.createNewSpilled(initialState, finiteState, epsilon, machine,
+                                              self.getPath(f"store{round}.db"), memoryBudget=2)
+            try:
+                self.assertEqual(lw4.readStore(connection), newMachine)
+            finally:
+                connection.close()
+            for word in getWords("abc"):
+                self.assertEqual(acceptsDfa(newMachine, word),
+                                 acceptsNfa(initialState, finiteState, machine, word), word)
+
+    def testRegexMatchesPythonRe(self):
+        for round in range(ROUNDS):
+            pattern = createRegex(self.rng)
+            nfaPath = self.getPath(f"regex{round}.csv")
+            modulePath = self.getPath(f"regex{round}.py")
+            lw5.processRegex(pattern, nfaPath)
+            lw4.processMachine(nfaPath, self.getPath(f"regex{round}_dfa.csv"), modulePath)
+            module = loadModule(modulePath)
+            expression = re.compile(pattern, re.DOTALL)
+            for word in getWords():
+                self.assertEqual(module.run(word), bool(expression.fullmatch(word)), (pattern, word))
+
+    def testGrammarMatchesDerivation(self):
+        for round in range(ROUNDS):
+            text, rules = createGrammar(self.rng)
+            grammarPath = self.getPath(f"grammar{round}.txt")
+            with open(grammarPath, "w", encoding="utf-8") as f:
+                f.write(text)
+            nfaPath = self.getPath(f"grammar{round}.csv")
+            modulePath = self.getPath(f"grammar{round}.py")
+            lw3.processGrammar(grammarPath, nfaPath)
+            lw4.processMachine(nfaPath, self.getPath(f"grammar{round}_dfa.csv"), modulePath)
+            module = loadModule(modulePath)
+            for word in getWords("abc"):
+                self.assertEqual(module.run(word), acceptsGrammar(rules, word), (text, word))
+
+
+class ScalingTest(unittest.TestCase):
+    def assertScales(self, createInput, function, size, maxRatio):
+        ratio = None
+        for _ in range(SCALING_ATTEMPTS):
+            small = measure(function, *createInput(size))
+            large = measure(function, *createInput(size * 2))
+            ratio = large / small
+            if ratio < maxRatio:
+                return
+        self.fail(f"{function.__name__}: time ratio {ratio:.2f} for n={size} -> {size * 2} exceeds {maxRatio}")
+
+    def testRegexScalesLinearly(self):
+        def parseAndBuild(pattern):
+            return lw5.buildNfa(lw5.parseRegex(pattern))
+
+        self.assertScales(lambda n: (f"(ab|c[a-z]?){{{n}}}",), parseAndBuild, 2000, LINEAR_RATIO)
+
+    def testFillEpsilonScalesQuadratically(self):
+        self.assertScales(lambda n: (createChainNfa(n, "ε")[2],), lw4.fillEpsilon, 300, QUADRATIC_RATIO)
+
+    def testCreateNewScalesQuadratically(self):
+        def createInput(size):
+            initialState, finiteState, machine = createChainNfa(size, "a")
+            return initialState, finiteState, lw4.fillEpsilon(machine), machine
+
+        self.assertScales(createInput, lw4.createNew, 300, QUADRATIC_RATIO)
+
+    def testCreateNewSpilledScalesLinearly(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        counter = itertools.count()
+
+        def createSpilled(initialState, finiteState, epsilon, machine):
+            storeFilename = os.path.join(directory, f"store{next(counter)}.db")
+            lw4.createNewSpilled(initialState, finiteState, epsilon, machine, storeFilename).close()
+
+        def createInput(size):
+            initialState, finiteState, machine = createChainNfa(size, "a")
+            return initialState, finiteState, lw4.fillEpsilon(machine), machine
+
+        self.assertScales(createInput, createSpilled, 800, LINEAR_RATIO)
+
+    def testMinimizeMooreScalesQuadratically(self):
+        def createInput(size):
+            rng = random.Random(SEED)
+            states = [f"q{i}" for i in range(size)]
+            inputSymbols = ["x1", "x2"]
+            transitions = {state: {symbol: rng.choice(states) for symbol in inputSymbols} for state in states}
+            return states, inputSymbols, transitions, {state: state for state in states}, states[0]
+
+        self.assertScales(createInput, lw2.minimizeMoore, 200, QUADRATIC_RATIO)
+
+    def testMinimizeMealyScalesQuadratically(self):
+        def createInput(size):
+            rng = random.Random(SEED)
+            states = [f"q{i}" for i in range(size)]
+            inputSymbols = ["x1", "x2"]
+            transitions = {state: {symbol: rng.choice(states) for symbol in inputSymbols} for state in states}
+            outputs = {state: {symbol: state for symbol in inputSymbols} for state in states}
+            return states, inputSymbols, transitions, outputs, states[0]
+
+        self.assertScales(createInput, lw2.minimizeMealy, 200, QUADRATIC_RATIO)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import os
+import subprocess
+import sys
+import time
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LABS = ("lw2taafl", "lw3taafl", "lw4taafl", "lw5taafl")
+LAZY_MODULES = ("array", "hashlib", "json", "mmap", "multiprocessing", "sqlite3")
+IMPORT_BUDGET_US = 50000
+STARTUP_BUDGET_S = 0.25
+RUNS = 3
+
+
+def runPython(*args):
+    return subprocess.run([sys.executable, *args], cwd=ROOT, capture_output=True, text=True)
+
+
+def getImportTime(stderr, module):
+    for line in stderr.splitlines():
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1])
+    raise AssertionError(f"{module} missing from -X importtime output")
+
+
+class StartupTest(unittest.TestCase):
+    def testImportBudget(self):
+        for lab in LABS:
+            with self.subTest(lab=lab):
+                module = f"{lab}.main"
+                code = f"import sys, {module}; print(' '.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+                runPython("-c", f"import {module}")
+                result = None
+                importTime = None
+                for _ in range(RUNS):
+                    result = runPython("-X", "importtime", "-c", code)
+                    self.assertEqual(result.returncode, 0, result.stderr)
+                    runTime = getImportTime(result.stderr, module)
+                    importTime = runTime if importTime is None else min(importTime, runTime)
+                self.assertEqual(result.stdout.strip(), "", f"{module} imports heavy modules eagerly")
+                self.assertLess(importTime, IMPORT_BUDGET_US)
+
+    def testStartupBudget(self):
+        commands = [[f"{lab}/main.py"] for lab in LABS] + [["-m", "taafl"]]
+        for command in commands:
+            with self.subTest(command=" ".join(command)):
+                elapsed = None
+                for _ in range(RUNS):
+                    start = time.perf_counter()
+                    result = runPython(*command)
+                    runTime = time.perf_counter() - start
+                    elapsed = runTime if elapsed is None else min(elapsed, runTime)
+                self.assertEqual(result.returncode, 1)
+                self.assertTrue(result.stdout.startswith("Usage:"), result.stdout)
+                self.assertLess(elapsed, STARTUP_BUDGET_S)
+
+
+if __name__ == "__main__":
+    unittest.main()